@@ -1,23 +1,218 @@
 import os
 import argparse
+import asyncio
+import contextlib
+import functools
 import replicate
+import replicate.exceptions
+import httpx
 import logging
 import sys
+from concurrent.futures import ThreadPoolExecutor
+from collections import Counter, defaultdict
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import AsyncIterator, Dict, FrozenSet, Iterable, Iterator, List, Optional, Tuple
 import json
+import re
+import sqlite3
+import threading
+import hashlib
+import fnmatch
+import random
+import mmap
+import zlib
+from dataclasses import dataclass
 from datetime import datetime
 import colorama
 from colorama import Fore, Style, Back
 import time
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    from rich.progress import Progress
+except ImportError:
+    Progress = None
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
 # Initialize colorama for cross-platform colored terminal output
 colorama.init(autoreset=True)
 
+# Statement boundaries used to split very long (e.g. minified) lines
+_STATEMENT_END_RE = re.compile(r"(?<=[;}])")
+
+# Marks the start of each file's section in a batched model response
+_RESULT_HEADER_RE = re.compile(r"^#{2,4}\s*RESULT\s+(\d+)\s*$", re.MULTILINE)
+
+# Directories that hold dependencies, VCS data or build output rather than source
+SKIP_DIRS = {"node_modules", ".git", "dist", "build", "vendor", ".next",
+             "__pycache__", "venv", ".venv", "target", ".deepwalker_cache"}
+
+# Generated bundles that are not worth sending to the model
+SKIP_SUFFIXES = (".min.js", ".bundle.js")
+
+# A NUL byte this close to the start of a file means it is not text
+BINARY_SNIFF_BYTES = 4096
+
+# HTTP statuses worth retrying: timeouts, rate limiting and server-side failures
+RETRYABLE_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+
+# Default number of AI requests in flight at once
+DEFAULT_CONCURRENCY = 16
+
+# Files at least this large are read through mmap
+MMAP_THRESHOLD = 64 * 1024
+
+# Default --max-file-size; larger files do not fit the model context anyway
+DEFAULT_MAX_FILE_SIZE = 512 * 1024
+
+# Smallest accepted --chunk-tokens; below this a file turns into a flood of tiny requests
+MIN_CHUNK_TOKENS = 500
+
+# Only files up to this size share a batched request; larger ones get their own
+BATCH_FILE_MAX_BYTES = 4 * 1024
+
+# Files whose comments are stripped before analysis unless --preserve-comments is given
+JS_EXTENSIONS = {".js", ".mjs", ".cjs", ".jsx", ".ts", ".tsx"}
+
+# After one of these characters a "/" starts a regular expression, not a division
+_REGEX_PRECEDERS = set("(,=:[!&|?{};~+-*%<>^")
+_REGEX_KEYWORD_RE = re.compile(r"(?<![\w$])(return|typeof|case|in|of|void|delete|throw|yield|await)\s*$")
+_SPACE_RUN_RE = re.compile(r"[ \t]+")
+_BLANK_LINES_RE = re.compile(r" *\n[ \n]*")
+
+def _collapse_whitespace(code: str) -> str:
+    """Collapse runs of spaces and tabs, trailing spaces and blank lines in code outside literals."""
+    return _BLANK_LINES_RE.sub("\n", _SPACE_RUN_RE.sub(" ", code))
+
+def _normalize_js(content: str) -> str:
+    """
+    Remove comments and redundant whitespace from JavaScript/TypeScript source.
+
+    String, template and regular expression literals are copied verbatim.
+    Line breaks are kept (automatic semicolon insertion depends on them), but
+    blank lines, trailing spaces and runs of spaces or tabs are collapsed.
+    """
+    out = []
+    code = []  # characters since the last literal, collapsed before the next one is written
+    i = 0
+    n = len(content)
+    last = ""  # last one or two significant characters written, to tell regexes from division
+
+    def emit_literal(literal: str):
+        out.append(_collapse_whitespace("".join(code)))
+        code.clear()
+        out.append(literal)
+
+    while i < n:
+        c = content[i]
+
+        if c in "'\"`":
+            # String or template literal
+            j = i + 1
+            while j < n and content[j] != c:
+                if content[j] == "\\":
+                    j += 1
+                elif content[j] == "\n" and c != "`":
+                    break
+                j += 1
+            emit_literal(content[i:j + 1])
+            last = c
+            i = j + 1
+        elif c == "/" and content.startswith("//", i) and not (
+                i >= 2 and content[i - 1] == ":" and (content[i - 2].isalnum() or content[i - 2] == "_")):
+            # Line comment; "word://" is left alone so URLs in JSX text survive
+            j = content.find("\n", i)
+            i = n if j == -1 else j
+        elif c == "/" and content.startswith("/*", i):
+            # Block comment, replaced by a space so tokens do not merge
+            j = content.find("*/", i + 2)
+            i = n if j == -1 else j + 2
+            code.append(" ")
+        elif c == "/" and (last == "" or (last[-1] in _REGEX_PRECEDERS and last not in ("++", "--"))
+                           or _REGEX_KEYWORD_RE.search(content, max(0, i - 12), i)):
+            # Regular expression literal, possibly with / inside a [...] class
+            # (after a postfix ++ or -- a / is a division instead)
+            j = i + 1
+            in_class = False
+            while j < n and content[j] != "\n":
+                ch = content[j]
+                if ch == "\\":
+                    j += 1
+                elif ch == "[":
+                    in_class = True
+                elif ch == "]":
+                    in_class = False
+                elif ch == "/" and not in_class:
+                    break
+                j += 1
+            emit_literal(content[i:j + 1])
+            last = "/"
+            i = j + 1
+        else:
+            code.append(c)
+            if not c.isspace():
+                last = last[-1:] + c
+            i += 1
+
+    emit_literal("")
+    return "".join(out).strip()
+
+def count_statuses(results) -> Counter:
+    """Count results by status in a single pass."""
+    return Counter(r.get('status', 'unknown') for r in results)
+
+def dumps_json_line(record: Dict) -> bytes:
+    """Serialize a record as one line of JSON (orjson if available, json otherwise)."""
+    if orjson is not None:
+        return orjson.dumps(record, option=orjson.OPT_APPEND_NEWLINE)
+    return (json.dumps(record, ensure_ascii=False) + "\n").encode('utf-8')
+
+def loads_json_line(line: bytes) -> Dict:
+    """Parse one line written by dumps_json_line."""
+    if orjson is not None:
+        return orjson.loads(line)
+    return json.loads(line)
+
+@functools.lru_cache(maxsize=1)
+def _token_encoding():
+    """
+    Load the tiktoken encoding on first use, or return None if it is not
+    available. The first load downloads the encoding, which fails offline.
+    """
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of prompt tokens in text (tiktoken if available, ~4 chars/token otherwise)."""
+    encoding = _token_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1
+
+@functools.lru_cache(maxsize=16)
 def load_system_prompt(system_prompt_source=None) -> str:
     """
     Load the system prompt from a string, file, or use default.
 
+    The result is memoized, so a prompt file is only read once per process.
+
     Args:
         system_prompt_source: Either a string containing the system prompt or a path to a file
 
@@ -47,6 +242,19 @@ def load_system_prompt(system_prompt_source=None) -> str:
     # If source is a direct string
     return system_prompt_source
 
+# Log record format, built once at import time
+_LOG_FORMAT = (
+    f'{Fore.CYAN}%(asctime)s{Style.RESET_ALL} - '
+    f'{Fore.GREEN}%(name)s{Style.RESET_ALL} - '
+    f'{Fore.YELLOW}%(levelname)s{Style.RESET_ALL} - %(message)s'
+)
+
+# Highlight colors for log arguments, passed as %s args so they are only
+# formatted into records that are actually emitted
+_BLUE = Fore.BLUE
+_YELLOW = Fore.YELLOW
+_RESET = Style.RESET_ALL
+
 # Configure logging
 def setup_logger(log_level=logging.INFO):
     """Configure and return a logger with proper formatting."""
@@ -63,22 +271,15 @@ def setup_logger(log_level=logging.INFO):
     console_handler.setLevel(log_level)
 
     # Create formatter
-    formatter = logging.Formatter(
-        f'{Fore.CYAN}%(asctime)s{Style.RESET_ALL} - '
-        f'{Fore.GREEN}%(name)s{Style.RESET_ALL} - '
-        f'{Fore.YELLOW}%(levelname)s{Style.RESET_ALL} - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
+    formatter = logging.Formatter(_LOG_FORMAT, datefmt='%Y-%m-%d %H:%M:%S')
 
     console_handler.setFormatter(formatter)
     logger.addHandler(console_handler)
 
     return logger
 
-# Create the banner
-def display_banner():
-    """Display a cool ASCII art banner for the tool."""
-    banner = f"""
+# Tool banner, built once at import time
+BANNER = f"""
 {Fore.CYAN}║ {Fore.RED}     _                                  _ _
 {Fore.CYAN}║ {Fore.RED}    | |                                | | |
 {Fore.CYAN}║ {Fore.RED}  __| | ___  ___ _ __  __      ____ _| | | __
@@ -90,235 +291,1433 @@ def display_banner():
 {Fore.CYAN}║
 {Fore.CYAN}  {Fore.GREEN}by Hibernatus
 """
-    print(banner)
+
+# Console summary; the failed count is colored by the caller
+SUMMARY_TEMPLATE = f"""
+{Fore.CYAN}
+{Fore.CYAN}║ {Fore.YELLOW} ANALYSIS SUMMARY
+{Fore.CYAN}
+{Fore.CYAN}║ {Fore.WHITE}Total files processed:    {Fore.GREEN}{{total:<5}}
+{Fore.CYAN}║ {Fore.WHITE}Successfully analyzed:    {Fore.GREEN}{{successful:<5}}
+{Fore.CYAN}║ {Fore.WHITE}Failed analyses:          {{failed_color}}{{failed:<5}}
+{Fore.CYAN}║ {Fore.WHITE}Skipped files:            {Fore.YELLOW}{{skipped:<5}}
+{Fore.CYAN}
+"""
+
+def display_banner():
+    """Display a cool ASCII art banner for the tool."""
+    print(BANNER)
+
+# Default --cache-max-entries; enough for large trees while bounding the database size
+DEFAULT_CACHE_MAX_ENTRIES = 100_000
+
+# Leading bytes of a zstd frame, telling compressed cache entries apart from zlib ones
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+class AnalysisCache:
+    """
+    Persistent SQLite store of AI analyses keyed by content hash.
+
+    Analyses are stored compressed, with zstd when the zstandard package is
+    installed and zlib otherwise.
+    """
+
+    def __init__(self, path: Path = Path(".deepwalker_cache") / "analyses.sqlite3", ttl: float = 7 * 86400,
+                 max_entries: int = DEFAULT_CACHE_MAX_ENTRIES):
+        """
+        Args:
+            path: Location of the SQLite database file
+            ttl: Seconds without being used after which a cached analysis is
+                 ignored and replaced
+            max_entries: Number of analyses kept when the cache is closed,
+                         most recently used first; 0 for no limit
+        """
+        if ttl <= 0 or max_entries < 0:
+            raise ValueError("ttl must be positive and max_entries cannot be negative")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # Shared by the event loop and worker threads, serialized by _lock
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._lock = threading.Lock()
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS analyses ("
+            "key TEXT PRIMARY KEY, analysis TEXT NOT NULL, created REAL NOT NULL)"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(analyses)")}
+        if "last_used" not in columns:
+            # Caches from before eviction was by use start out as last used when created
+            self._conn.execute("ALTER TABLE analyses ADD COLUMN last_used REAL")
+            self._conn.execute("UPDATE analyses SET last_used = created")
+            self._conn.execute("DROP INDEX IF EXISTS analyses_created")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS analyses_last_used ON analyses (last_used)")
+        # Fast path: the key last computed for a file, valid while its mtime and size are unchanged
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS fingerprints ("
+            "path TEXT NOT NULL, config TEXT NOT NULL, mtime_ns INTEGER NOT NULL, size INTEGER NOT NULL, "
+            "key TEXT NOT NULL, PRIMARY KEY (path, config))"
+        )
+        self._conn.commit()
+        # Keys hit since the last prune; their last_used is updated in one batch then
+        self._used = {}
+
+    @staticmethod
+    def make_key(content: str, api_model: str, system_prompt_hash: bytes) -> str:
+        """Build the cache key for content analyzed with a given model and system prompt."""
+        h = hashlib.blake2b(digest_size=32)
+        h.update(content.encode('utf-8'))
+        h.update(b"\0" + api_model.encode('utf-8') + b"\0")
+        h.update(system_prompt_hash)
+        return h.hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached analysis for key, or None if missing or expired."""
+        with self._lock:
+            row = self._conn.execute("SELECT analysis, last_used FROM analyses WHERE key = ?", (key,)).fetchone()
+            now = datetime.now().timestamp()
+            if row is None or now - row[1] > self.ttl:
+                return None
+            self._used[key] = now
+        return self._decompress(row[0])
+
+    def set(self, key: str, analysis: str):
+        """Store an analysis under key, replacing any previous entry."""
+        value = self._compress(analysis)
+        now = datetime.now().timestamp()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO analyses (key, analysis, created, last_used) VALUES (?, ?, ?, ?)",
+                (key, value, now, now)
+            )
+            self._used.pop(key, None)
+            self._conn.commit()
+
+    @staticmethod
+    def _compress(analysis: str) -> bytes:
+        data = analysis.encode('utf-8')
+        if zstandard is not None:
+            return zstandard.ZstdCompressor(level=3).compress(data)
+        return zlib.compress(data, 6)
+
+    @staticmethod
+    def _decompress(value) -> Optional[str]:
+        """Decode a stored analysis, or return None if it cannot be read here."""
+        if isinstance(value, str):
+            # Written uncompressed by an older version
+            return value
+        try:
+            if value.startswith(_ZSTD_MAGIC):
+                if zstandard is None:
+                    return None
+                return zstandard.ZstdDecompressor().decompress(value).decode('utf-8')
+            return zlib.decompress(value).decode('utf-8')
+        except Exception:
+            # Treat a corrupt entry as a miss; it is replaced once re-analyzed
+            return None
+
+    def get_fingerprint(self, path: str, config: str, mtime_ns: int, size: int) -> Optional[str]:
+        """Return the key recorded for a file, if it has not changed since."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT key FROM fingerprints WHERE path = ? AND config = ? AND mtime_ns = ? AND size = ?",
+                (path, config, mtime_ns, size)
+            ).fetchone()
+        return row[0] if row else None
+
+    def set_fingerprint(self, path: str, config: str, mtime_ns: int, size: int, key: str):
+        """Record the key for a file as of the given modification time and size."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO fingerprints (path, config, mtime_ns, size, key) VALUES (?, ?, ?, ?, ?)",
+                (path, config, mtime_ns, size, key)
+            )
+            self._conn.commit()
+
+    def prune(self):
+        """
+        Record the use of the analyses hit since the last prune, then delete
+        expired analyses, the least recently used ones beyond max_entries,
+        and their fingerprints.
+        """
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE analyses SET last_used = ? WHERE key = ?",
+                [(used, key) for key, used in self._used.items()]
+            )
+            self._used.clear()
+            self._conn.execute("DELETE FROM analyses WHERE last_used < ?", (datetime.now().timestamp() - self.ttl,))
+            if self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM analyses WHERE key IN "
+                    "(SELECT key FROM analyses ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,)
+                )
+            self._conn.execute("DELETE FROM fingerprints WHERE key NOT IN (SELECT key FROM analyses)")
+            self._conn.commit()
+
+    def close(self):
+        """Prune the cache and close the underlying database connection."""
+        self.prune()
+        with self._lock:
+            self._conn.close()
+
+# Rules framing each report entry, built once instead of per file
+_H1_RULE = "=" * 80 + "\n"
+_H2_RULE = "-" * 80 + "\n"
+_ENTRY_SEPARATOR = "\n\n" + _H1_RULE + "\n"
+
+class ReportWriter:
+    """
+    Writes the text report one entry at a time, so results reach the disk
+    shortly after they are available and a partial report survives an
+    interrupted run.
+    Optionally writes every result as a JSON line to a second file as well.
+
+    The files are only opened, and the header written, with the first entry,
+    so a run that analyzes nothing leaves an earlier report untouched.
+
+    Usage:
+        with ReportWriter(path) as report:
+            report.write_entry(result)
+            report.write_summary()
+    """
+
+    # Large buffer so many small entries coalesce into few writes
+    BUFFER_SIZE = 1 << 20
+    # Seconds between flushes of the text report; JSON lines are flushed one
+    # by one, since an interrupted run is resumed from them
+    FLUSH_INTERVAL = 1.0
+
+    def __init__(self, output_path: Path, json_path: Optional[Path] = None,
+                 carried_records: Iterable[Dict] = ()):
+        """
+        Args:
+            output_path: Where to write the text report
+            json_path: Optional JSON Lines file to write every result to
+            carried_records: Completed results from an interrupted run, written
+                             to json_path as soon as it is created so they
+                             survive another interruption
+        """
+        self.output_path = output_path
+        self.json_path = json_path
+        # File to analysis of each carried record; an entry with the same
+        # analysis is already in the JSON Lines file
+        self._carried_records = list(carried_records)
+        self._carried = {}
+        self.entries = 0
+        # Statuses of the entries written so far, counted in the same pass
+        self.counts = Counter()
+        self._file = None
+        self._json_file = None
+        self._last_flush = 0.0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._file is not None:
+            self._file.close()
+        if self._json_file is not None:
+            self._json_file.close()
+        return False
+
+    def _open(self):
+        """Create the output files and write the report title and generation time."""
+        self._file = open(self.output_path, 'w', encoding='utf-8', buffering=self.BUFFER_SIZE)
+        if self.json_path is not None:
+            self._json_file = open(self.json_path, 'wb', buffering=self.BUFFER_SIZE)
+            for record in self._carried_records:
+                self._json_file.write(dumps_json_line(record))
+                self._carried[record["file"]] = record.get("analysis")
+            self._json_file.flush()
+        self._carried_records = None
+        self._file.write("=== REPORT ===\n"
+                         f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
+
+    def write_entry(self, result: Dict):
+        """Write the section for a single analyzed file."""
+        if self._file is None:
+            self._open()
+        self.entries += 1
+        status = result.get('status', 'unknown')
+        self.counts[status] += 1
+
+        # File header and status
+        parts = [
+            f"FILE #{self.entries}: {result['file']}\n",
+            _H1_RULE,
+            f"Status: {status.upper()}\n",
+        ]
+        if 'duplicate_of' in result:
+            parts.append(f"Same content as: {result['duplicate_of']}\n")
+
+        # Timestamp if available
+        if 'timestamp' in result:
+            parts.append(f"Analyzed: {result['timestamp']}\n\n")
+        else:
+            parts.append("\n")
+
+        # Analysis or error
+        if 'error' in result:
+            parts.append(f"ERROR: {result['error']}\n")
+        elif 'reason' in result:
+            parts.append(f"NOTE: {result['reason']}\n")
+        else:
+            parts.extend(("ANALYSIS:\n", _H2_RULE, result['analysis'], "\n"))
+
+        # Separator between files
+        parts.append(_ENTRY_SEPARATOR)
+        self._file.write("".join(parts))
+
+        carried = self._carried.pop(result['file'], None)
+        if self._json_file is not None and (carried is None or carried != result.get('analysis')):
+            self._json_file.write(dumps_json_line(result))
+            self._json_file.flush()
+
+        now = time.monotonic()
+        if now - self._last_flush >= self.FLUSH_INTERVAL:
+            self._file.flush()
+            self._last_flush = now
+
+    def flush(self):
+        """Push buffered entries to disk."""
+        if self._file is None:
+            return
+        self._file.flush()
+        if self._json_file is not None:
+            self._json_file.flush()
+
+    def write_summary(self, counts: Optional[Dict[str, int]] = None):
+        """
+        Write the closing summary, unless no entry was written.
+
+        Args:
+            counts: Optional mapping of status to number of files with that
+                    status; defaults to the counts of the entries written
+        """
+        if self._file is None:
+            return
+        if counts is None:
+            counts = self.counts
+        self._file.write(
+            "=== SUMMARY ===\n"
+            f"Total files processed: {self.entries}\n"
+            f"Successfully analyzed: {counts.get('completed', 0)}\n"
+            f"Failed analyses: {counts.get('failed', 0)}\n"
+            f"Skipped files: {counts.get('skipped', 0)}\n"
+        )
+
+class ProgressReporter:
+    """
+    Tracks how many files have been analyzed, as a rich progress bar when rich
+    is installed, or as an INFO log line every 10% otherwise. Log lines are
+    also used in debug mode, where other output would break up the bar.
+
+    While the bar is shown, the logger's console handlers write through rich,
+    so warnings appear above the bar instead of garbling it.
+    """
+
+    def __init__(self, total: int, logger, description: str = "Analyzing"):
+        self.total = total
+        self.logger = logger
+        self.description = description
+        self.done = 0
+        self._step = max(1, total // 10)
+        self._next_report = self._step
+        self._progress = None
+        self._task = None
+        self._redirected = []  # (handler, original stream)
+
+    def __enter__(self):
+        if Progress is not None and not self.logger.isEnabledFor(logging.DEBUG):
+            stdout, stderr = sys.stdout, sys.stderr
+            self._progress = Progress()
+            # Replaces sys.stdout/sys.stderr with proxies that print above the bar
+            self._progress.start()
+            # (rich only redirects them when writing to a terminal)
+            proxies = {id(old): new for old, new in ((stdout, sys.stdout), (stderr, sys.stderr)) if new is not old}
+            for handler in self.logger.handlers:
+                stream = getattr(handler, "stream", None)
+                if isinstance(handler, logging.StreamHandler) and id(stream) in proxies:
+                    self._redirected.append((handler, handler.setStream(proxies[id(stream)])))
+            self._task = self._progress.add_task(self.description, total=self.total)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._progress is not None:
+            for handler, stream in self._redirected:
+                handler.setStream(stream)
+            self._redirected.clear()
+            self._progress.stop()
+        return False
+
+    def advance(self, count: int = 1):
+        """Record that count more files have finished."""
+        self.done += count
+        if self._progress is not None:
+            self._progress.advance(self._task, count)
+        elif self.done >= self._next_report or self.done == self.total:
+            self.logger.info("%s: %d/%d files done", self.description, self.done, self.total)
+            self._next_report = self.done + self._step
+
+class RateLimiter:
+    """
+    Token-bucket throttle for API requests, limited by requests per minute
+    and/or prompt tokens per minute. A limit of 0 disables that bucket.
+    """
+
+    def __init__(self, requests_per_minute: int = 0, tokens_per_minute: int = 0):
+        if requests_per_minute < 0 or tokens_per_minute < 0:
+            raise ValueError("rate limits cannot be negative")
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        # Both buckets start full, allowing a burst of up to one minute's budget
+        self._requests = float(requests_per_minute)
+        self._tokens = float(tokens_per_minute)
+        self._updated = time.monotonic()
+        # Waiters are served one at a time so large requests are not starved
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+        self._requests = min(self.requests_per_minute, self._requests + elapsed * self.requests_per_minute / 60)
+        self._tokens = min(self.tokens_per_minute, self._tokens + elapsed * self.tokens_per_minute / 60)
+
+    async def acquire(self, tokens: int = 1):
+        """Wait until one request using the given number of prompt tokens fits in both budgets."""
+        if not self.requests_per_minute and not self.tokens_per_minute:
+            return
+        # A prompt bigger than the whole budget still has to go out eventually
+        tokens = min(tokens, self.tokens_per_minute)
+        async with self._lock:
+            while True:
+                self._refill()
+                wait = 0.0
+                if self.requests_per_minute and self._requests < 1:
+                    wait = (1 - self._requests) * 60 / self.requests_per_minute
+                if self.tokens_per_minute and self._tokens < tokens:
+                    wait = max(wait, (tokens - self._tokens) * 60 / self.tokens_per_minute)
+                if wait <= 0:
+                    break
+                await asyncio.sleep(wait)
+            if self.requests_per_minute:
+                self._requests -= 1
+            if self.tokens_per_minute:
+                self._tokens -= tokens
+
+
+def normalize_extensions(file_extensions) -> Optional[FrozenSet[str]]:
+    """
+    Turn one extension or a list of them, with or without the dot, into a
+    set of lowercase dotted suffixes; None (no filter) stays None.
+    """
+    if file_extensions is None:
+        return None
+    if isinstance(file_extensions, str):
+        file_extensions = [file_extensions]
+    return frozenset("." + ext.lower().lstrip(".") for ext in file_extensions)
+
+@dataclass(frozen=True)
+class FilterConfig:
+    """
+    Which files get analyzed. Built once, normalized, and consulted for
+    every path during the directory walk and before each file is read.
+    """
+    exts: Optional[FrozenSet[str]] = None  # lowercase suffixes with the dot, None for all files
+    # Glob patterns matched against paths relative to the analyzed directory
+    include: Tuple[str, ...] = ()
+    exclude: Tuple[str, ...] = ()
+    max_bytes: int = DEFAULT_MAX_FILE_SIZE  # 0 for no limit
+    skip_binary: bool = True
+    skip_vendor: bool = True  # SKIP_DIRS and SKIP_SUFFIXES
+    # Resolved paths never walked, such as the report files being written
+    skip_paths: FrozenSet[str] = frozenset()
+
 
 class CodeAnalyzer:
     """Analyzes code for using AI."""
 
-    def __init__(self, api_model: str = "anthropic/claude-3.5-sonnet", logger=None, system_prompt=None):
+    def __init__(self, api_model: str = "anthropic/claude-3.5-sonnet", logger=None, system_prompt=None,
+                 concurrency: int = DEFAULT_CONCURRENCY, batch_tokens: int = 0, cache: Optional[AnalysisCache] = None,
+                 filters: Optional[FilterConfig] = None, chunk_tokens: int = 0,
+                 strip_comments: bool = True, requests_per_minute: int = 0, tokens_per_minute: int = 0):
         self.api_model = api_model
         self.logger = logger or setup_logger()
         self.system_prompt = system_prompt
-        self.stats = {
-            "files_analyzed": 0,
-            "files_with_issues": 0,
-            "errors": 0
-        }
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        self.concurrency = concurrency
+        self.batch_tokens = batch_tokens  # 0 disables batching of small files
+        self.filters = filters or FilterConfig()
+        self.chunk_tokens = chunk_tokens  # 0 sends every file whole
+        self.strip_comments = strip_comments  # applies to JS_EXTENSIONS only
+        self.requests_per_minute = requests_per_minute  # 0 for no limit
+        self.tokens_per_minute = tokens_per_minute  # 0 for no limit
+        # Network requests are bounded by _request_slot and _limiter; blocking file
+        # reads and result structuring run on _cpu_pool so they never stall the event loop
+        self._start_run()
+        self._cpu_pool = ThreadPoolExecutor(max_workers=os.cpu_count() or 4)
+        self.cache = cache
+        # Computed once per analyzer and reused for every cache key
+        self.system_prompt_hash = hashlib.blake2b((system_prompt or "").encode('utf-8'), digest_size=16).digest()
+        # Everything besides file content that changes what is sent to the model
+        self._cache_config = hashlib.blake2b(
+            self.api_model.encode('utf-8') + b"\0" + self.system_prompt_hash + bytes([strip_comments]),
+            digest_size=16
+        ).hexdigest()
+        # (mtime_ns, size) of each file as it was read, for the cache fast path
+        self._read_stats = {}
+        # (mtime_ns, size) of each file found by _find_files, taken from the walk
+        self._walk_stats = {}
+        # Completed records from an interrupted run's JSON Lines file, see load_resume
+        self._resumed = {}
 
     def analyze_file(self, file_path: Path) -> Dict:
+        """Synchronous wrapper around analyze_file_async."""
+        async def run():
+            self._start_run()
+            return await self.analyze_file_async(file_path)
+        return asyncio.run(run())
+
+    async def analyze_file_async(self, file_path: Path) -> Dict:
         """Analyze a single file and return structured results."""
-        self.logger.info(f"Analyzing file: {Fore.BLUE}{file_path}{Style.RESET_ALL}")
+        self.logger.debug("Analyzing file: %s%s%s", _BLUE, file_path, _RESET)
+
+        loop = asyncio.get_running_loop()
 
         try:
-            with open(file_path, 'r', encoding='utf-8') as file:
-                content = file.read().strip()
+            # Decide from the size alone before paying for a read
+            size = self._file_stat(file_path)[1]
+            if size == 0:
+                self.logger.warning("File is empty: %s", file_path)
+                return {"file": str(file_path), "status": "skipped", "reason": "empty file"}
+            if self.filters.max_bytes and size > self.filters.max_bytes:
+                self.logger.warning("File is larger than %d bytes: %s", self.filters.max_bytes, file_path)
+                return {"file": str(file_path), "status": "skipped", "reason": "too large"}
+            if self.filters.skip_binary and await loop.run_in_executor(self._cpu_pool, self._looks_binary, file_path):
+                self.logger.warning("File looks binary: %s", file_path)
+                return {"file": str(file_path), "status": "skipped", "reason": "binary"}
+
+            content = await loop.run_in_executor(self._cpu_pool, self._read_file, file_path)
 
             if not content:
-                self.logger.warning(f"File is empty: {file_path}")
+                self.logger.warning("File is empty: %s", file_path)
                 return {"file": str(file_path), "status": "skipped", "reason": "empty file"}
 
-            # Generate detailed analysis prompt
-            prompt = self._create_analysis_prompt(content)
-
-            # Get analysis from AI model
-            self.logger.debug(f"Sending file to AI model for analysis: {file_path}")
-            response = self._get_ai_analysis(prompt)
+            key, cached = await loop.run_in_executor(self._cpu_pool, self._cache_lookup, content, file_path)
+            if cached is not None:
+                return cached
+
+            # Split files over the token threshold into overlapping chunks
+            if self.chunk_tokens > 0:
+                chunks = await loop.run_in_executor(self._cpu_pool, self._chunk_content, content, self.chunk_tokens)
+            else:
+                chunks = [content]
+
+            if len(chunks) == 1:
+                # Generate detailed analysis prompt
+                prompt = self._create_analysis_prompt(content)
+
+                # Get analysis from AI model
+                self.logger.debug("Sending file to AI model for analysis: %s", file_path)
+                response = await self._get_ai_analysis_async(prompt)
+            else:
+                # Analyze all chunks in parallel and merge the answers
+                self.logger.debug("Sending file to AI model in %d chunks: %s", len(chunks), file_path)
+                responses = await asyncio.gather(*(
+                    self._get_ai_analysis_async(self._create_chunk_prompt(chunk, n, len(chunks)))
+                    for n, chunk in enumerate(chunks, 1)
+                ))
+                failed = [r for r in responses if r.startswith("Error getting AI analysis")]
+                response = failed[0] if failed else self._merge_chunk_analyses(responses)
 
             # Check if there was an error in getting the AI analysis
             if response.startswith("Error getting AI analysis"):
                 self.stats["errors"] += 1
                 return {"file": str(file_path), "status": "failed", "error": response}
 
+            await loop.run_in_executor(self._cpu_pool, self._cache_store, key, response, file_path)
+
             # Extract and structure information
-            result = self._structure_results(response, file_path)
+            result = await loop.run_in_executor(self._cpu_pool, self._structure_results, response, file_path)
 
             # Update stats - all successfully analyzed files count as analyzed
             self.stats["files_analyzed"] += 1
 
-            self.logger.info(f"✅ Completed analysis of: {Fore.BLUE}{file_path}{Style.RESET_ALL}")
+            self.logger.debug("✅ Completed analysis of: %s%s%s", _BLUE, file_path, _RESET)
             return result
 
         except Exception as e:
             self.stats["errors"] += 1
-            error_msg = f"❌ Error analyzing {file_path}: {str(e)}"
-            self.logger.error(error_msg)
+            self.logger.error("❌ Error analyzing %s: %s", file_path, e)
             return {"error": str(e), "file": str(file_path), "status": "failed"}
 
+    async def analyze_batch_async(self, batch: List[Tuple[Path, str]]) -> List[Dict]:
+        """
+        Analyze several small files with a single AI request.
+
+        Falls back to analyzing each file on its own if the response cannot
+        be split back into one section per file.
+        """
+        loop = asyncio.get_running_loop()
+        lookups = await asyncio.gather(*(
+            loop.run_in_executor(self._cpu_pool, self._cache_lookup, content, file_path)
+            for file_path, content in batch
+        ))
+
+        results = {}
+        misses = []
+        keys = []
+        for (file_path, content), (key, cached) in zip(batch, lookups):
+            if cached is not None:
+                results[file_path] = cached
+            else:
+                misses.append((file_path, content))
+                keys.append(key)
+
+        if len(misses) == 1:
+            results[misses[0][0]] = await self.analyze_file_async(misses[0][0])
+        elif misses:
+            for result in await self._analyze_uncached_batch(misses, keys):
+                results[Path(result["file"])] = result
+
+        return [results[file_path] for file_path, _ in batch]
+
+    async def _analyze_uncached_batch(self, batch: List[Tuple[Path, str]], keys: List[Optional[str]]) -> List[Dict]:
+        """
+        Send a batch of files to the AI model in one request and split the answer per file.
+
+        Args:
+            batch: (path, content) pairs of the files to analyze
+            keys: Cache key of each file's content, as returned by _cache_lookup
+        """
+        paths = [file_path for file_path, _ in batch]
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug("Analyzing batch of %d files: %s%s%s", len(batch), _BLUE, ", ".join(map(str, paths)), _RESET)
+
+        prompt = self._create_batch_prompt(batch)
+        response = await self._get_ai_analysis_async(prompt)
+
+        if response.startswith("Error getting AI analysis"):
+            self.stats["errors"] += len(batch)
+            return [{"file": str(file_path), "status": "failed", "error": response} for file_path in paths]
+
+        sections = self._split_batched_response(response, len(batch))
+        if sections is None:
+            self.logger.warning("Could not split batched response, re-analyzing %d files individually", len(batch))
+            return list(await asyncio.gather(*(self.analyze_file_async(file_path) for file_path in paths)))
+
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(
+            loop.run_in_executor(self._cpu_pool, self._cache_store, key, section, file_path)
+            for key, section, file_path in zip(keys, sections, paths)
+        ))
+        results = await asyncio.gather(*(
+            loop.run_in_executor(self._cpu_pool, self._structure_results, section, file_path)
+            for section, file_path in zip(sections, paths)
+        ))
+        self.stats["files_analyzed"] += len(results)
+
+        self.logger.debug("✅ Completed analysis of batch of %d files", len(batch))
+        return results
+
+    def _start_run(self):
+        """Reset the state bound to an event loop before analyzing in a new one."""
+        # Every result of a run carries the time the run started
+        self.run_started_iso = datetime.now().isoformat(timespec='seconds')
+        # Counts reported by generate_summary cover the latest run only
+        self.stats = {
+            "files_analyzed": 0,
+            "files_with_issues": 0,
+            "errors": 0,
+            "by_status": Counter()
+        }
+        # Requests in flight are capped at _effective_concurrency, which is halved
+        # when the API rate limits us and grows back by one per clean minute
+        self._effective_concurrency = self.concurrency
+        self._in_flight = 0
+        self._slot_free = asyncio.Condition()
+        self._last_throttled = time.monotonic()
+        self._limiter = RateLimiter(self.requests_per_minute, self.tokens_per_minute)
+        # Pooled connections belong to the event loop they were opened on
+        self._replicate = self._create_client()
+
+    @contextlib.asynccontextmanager
+    async def _request_slot(self):
+        """Hold one of the _effective_concurrency request slots."""
+        async with self._slot_free:
+            await self._slot_free.wait_for(lambda: self._in_flight < self._effective_concurrency)
+            self._in_flight += 1
+        try:
+            yield
+        finally:
+            async with self._slot_free:
+                self._in_flight -= 1
+                self._slot_free.notify()
+
+    async def _adjust_concurrency(self, started: float, throttled: bool):
+        """
+        Additive-increase/multiplicative-decrease of the concurrency limit.
+
+        Args:
+            started: Monotonic time at which the finished request was sent
+            throttled: Whether the API answered it with a rate limit error
+        """
+        now = time.monotonic()
+        if throttled:
+            # Requests sent before the last decrease already count against it
+            if started >= self._last_throttled and self._effective_concurrency > 1:
+                self._effective_concurrency = max(1, self._effective_concurrency // 2)
+                self.logger.warning("Rate limited, reducing concurrency to %d", self._effective_concurrency)
+            self._last_throttled = now
+        elif self._effective_concurrency < self.concurrency and now - self._last_throttled >= 60:
+            self._effective_concurrency += 1
+            self._last_throttled = now
+            self.logger.debug("Increasing concurrency to %d", self._effective_concurrency)
+            async with self._slot_free:
+                self._slot_free.notify()
+
+    def _create_client(self) -> replicate.Client:
+        """
+        Create the Replicate client shared by every request of a run, so its
+        pooled HTTP connections are reused instead of reconnecting per file.
+        """
+        # Streams can stay quiet for a while before the first token arrives
+        return replicate.Client(timeout=httpx.Timeout(300.0, connect=30.0))
+
+    def _cache_lookup(self, content: str, file_path: Path) -> Tuple[Optional[str], Optional[Dict]]:
+        """
+        Hash content into its cache key and look it up. Meant to run on
+        _cpu_pool, as hashing a large file and querying SQLite both block.
+
+        Returns:
+            A tuple of (key, result): the key to store a new analysis under
+            (None when caching is off), and the completed result from the
+            cache, or None on a miss
+        """
+        key = None
+        analysis = None
+        if self.cache is not None:
+            key = AnalysisCache.make_key(content, self.api_model, self.system_prompt_hash)
+            analysis = self.cache.get(key)
+
+        if analysis is None:
+            analysis = self._resumed_analysis(file_path)
+            if analysis is None:
+                return key, None
+            self.logger.debug("Using analysis from the interrupted run for: %s", file_path)
+            self._cache_store(key, analysis, file_path)
+        else:
+            self.logger.debug("Using cached analysis for: %s", file_path)
+            self._remember_fingerprint(file_path, key)
+        return key, self._cached_completed(analysis, file_path)
+
+    def load_resume(self, json_path: Path) -> List[Dict]:
+        """
+        Load the completed analyses from a JSON Lines file written by an
+        interrupted run (--json-out), so files unchanged since are not sent
+        to the model again.
+
+        Returns:
+            The records loaded, one per file that has not changed since it was
+            analyzed; they are meant to be carried over to the new JSON Lines
+            file, see ReportWriter
+        """
+        with open(json_path, 'rb') as file:
+            for line in file:
+                try:
+                    record = loads_json_line(line)
+                except ValueError:
+                    # The last line of a killed run may be cut short
+                    continue
+                # Records without the file's stat cannot be checked for changes
+                if record.get("status") == "completed" and "analysis" in record and "mtime_ns" in record:
+                    self._resumed[record["file"]] = record
+        for file, record in list(self._resumed.items()):
+            try:
+                unchanged = self._file_stat(Path(file)) == (record["mtime_ns"], record.get("size"))
+            except OSError:
+                unchanged = False
+            if not unchanged:
+                del self._resumed[file]
+        return list(self._resumed.values())
+
+    def _resumed_analysis(self, file_path: Path) -> Optional[str]:
+        """Return the analysis loaded by load_resume for a file, unless the file changed since it was analyzed."""
+        resumed = self._resumed.pop(str(file_path), None)
+        if resumed is not None and self._file_stat(file_path) == (resumed["mtime_ns"], resumed.get("size")):
+            return resumed["analysis"]
+        return None
+
+    def _cached_completed(self, analysis: str, file_path: Path) -> Dict:
+        """Build the completed result for an analysis taken from the cache."""
+        self.stats["files_analyzed"] += 1
+        result = self._structure_results(analysis, file_path)
+        result["cached"] = True
+        return result
+
+    def _cache_store(self, key: Optional[str], analysis: str, file_path: Path):
+        """Remember a successful analysis under the key from _cache_lookup for later runs."""
+        if self.cache is not None and key is not None:
+            self.cache.set(key, analysis)
+            self._remember_fingerprint(file_path, key)
+
+    def _remember_fingerprint(self, file_path: Path, key: str):
+        """Map the file, as it was when read, to its cache key."""
+        read_stat = self._read_stats.pop(str(file_path), None)
+        if read_stat is not None:
+            self.cache.set_fingerprint(str(file_path), self._cache_config, read_stat[0], read_stat[1], key)
+
+    def _lookup_unchanged(self, files: List[Path]) -> Tuple[List[Dict], List[Path]]:
+        """
+        Find files whose cached analysis can be used without reading them,
+        because their modification time and size match the last run.
+
+        Returns:
+            A tuple of (results, remaining): completed results for unchanged
+            files, and the files that still need to be read
+        """
+        results = []
+        remaining = []
+        for file_path in files:
+            try:
+                mtime_ns, size = self._file_stat(file_path)
+            except OSError:
+                remaining.append(file_path)
+                continue
+            key = self.cache.get_fingerprint(str(file_path), self._cache_config, mtime_ns, size)
+            analysis = self.cache.get(key) if key else None
+            if analysis is None:
+                remaining.append(file_path)
+            else:
+                results.append(self._cached_completed(analysis, file_path))
+        return results, remaining
+
+    def close(self):
+        """Release the worker pool and the analysis cache."""
+        self._cpu_pool.shutdown(wait=False)
+        if self.cache is not None:
+            self.cache.close()
+
+    def _file_stat(self, file_path: Path) -> Tuple[int, int]:
+        """Return (mtime_ns, size) of a file, reusing the stat from the directory walk if there was one."""
+        stat = self._walk_stats.get(str(file_path))
+        if stat is None:
+            st = file_path.stat()
+            stat = (st.st_mtime_ns, st.st_size)
+        return stat
+
+    def _looks_binary(self, file_path: Path) -> bool:
+        """Check whether a file has a NUL byte in its first BINARY_SNIFF_BYTES bytes."""
+        with open(file_path, 'rb') as file:
+            return b"\0" in file.read(BINARY_SNIFF_BYTES)
+
+    def _read_file(self, file_path: Path) -> str:
+        """
+        Read a file's content with surrounding whitespace stripped, and
+        comments removed from JavaScript/TypeScript unless disabled.
+        """
+        with open(file_path, 'rb') as file:
+            st = os.fstat(file.fileno())
+            self._read_stats[str(file_path)] = (st.st_mtime_ns, st.st_size)
+            if st.st_size < MMAP_THRESHOLD:
+                # For small files the mapping costs more than it saves
+                content = file.read().decode('utf-8')
+            else:
+                # Decode straight from the page cache without an intermediate bytes copy
+                with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    content = str(mm, 'utf-8')
+        # Same CRLF handling as text mode
+        content = content.replace('\r\n', '\n').strip()
+        if self.strip_comments and file_path.suffix.lower() in JS_EXTENSIONS:
+            content = _normalize_js(content)
+        return content
+
     def _create_analysis_prompt(self, content: str) -> str:
         """Create a detailed analysis prompt for the AI model."""
         return f"""
 {content}
 """
 
-    def _get_ai_analysis(self, prompt: str) -> str:
-        """Get analysis from the AI model using streaming with retry mechanism."""
-        max_retries = 3
+    def _create_chunk_prompt(self, chunk: str, n: int, total: int) -> str:
+        """Create the prompt for one chunk of a file that is too large to send whole."""
+        return f"""
+This is part {n} of {total} of a file that is too large to analyze at once. Consecutive parts overlap slightly.
+
+{chunk}
+"""
+
+    def _chunk_content(self, content: str, max_tokens: int = 4000, overlap: int = 200) -> List[str]:
+        """
+        Split content into overlapping chunks of at most max_tokens tokens.
+
+        Chunks end on line boundaries where possible; lines that are too long on
+        their own (minified code) are split after statements ending in ; or }.
+
+        Args:
+            content: Text to split
+            max_tokens: Token budget for a single chunk
+            overlap: Approximate number of tokens repeated at the start of the next
+                     chunk, capped at a quarter of max_tokens so chunks keep advancing
+
+        Returns:
+            The chunks in order, or [content] if it already fits
+        """
+        if estimate_tokens(content) <= max_tokens:
+            return [content]
+        overlap = min(overlap, max_tokens // 4)
+
+        # Break the content into pieces that each fit in a chunk
+        pieces = []
+        for line in content.splitlines(keepends=True):
+            tokens = estimate_tokens(line)
+            if tokens <= max_tokens:
+                pieces.append((line, tokens))
+                continue
+            for statement in _STATEMENT_END_RE.split(line):
+                if not statement:
+                    continue
+                # Hard split anything still too large, starting at ~3 characters per
+                # token and halving parts that the tokenizer still counts as over budget
+                step = max_tokens * 3
+                parts = [statement[start:start + step] for start in range(0, len(statement), step)]
+                while parts:
+                    part = parts.pop(0)
+                    tokens = estimate_tokens(part)
+                    if tokens > max_tokens and len(part) > 1:
+                        half = len(part) // 2
+                        parts[:0] = [part[:half], part[half:]]
+                    else:
+                        pieces.append((part, tokens))
+
+        # Greedily group pieces, repeating the tail of each chunk in the next
+        chunks = []
+        current = []
+        current_tokens = 0
+        for piece, tokens in pieces:
+            if current and current_tokens + tokens > max_tokens:
+                chunks.append("".join(p for p, _ in current))
+                carry = []
+                carry_tokens = 0
+                for prev, prev_tokens in reversed(current):
+                    if carry_tokens + prev_tokens > min(overlap, max_tokens - tokens):
+                        break
+                    carry.insert(0, (prev, prev_tokens))
+                    carry_tokens += prev_tokens
+                current, current_tokens = carry, carry_tokens
+            current.append((piece, tokens))
+            current_tokens += tokens
+
+        if current:
+            chunks.append("".join(p for p, _ in current))
+        return chunks
+
+    def _merge_chunk_analyses(self, responses: List[str]) -> str:
+        """
+        Merge the analyses of a file's chunks into one.
+
+        Paragraphs repeated verbatim in several chunk analyses, typically findings
+        in the overlapping regions, are kept only once.
+        """
+        seen = set()
+        parts = []
+        for n, response in enumerate(responses, 1):
+            paragraphs = []
+            for paragraph in re.split(r"\n\s*\n", response):
+                key = " ".join(paragraph.split())
+                if key and key not in seen:
+                    seen.add(key)
+                    paragraphs.append(paragraph.strip())
+            parts.append(f"--- Part {n}/{len(responses)} ---\n" + "\n\n".join(paragraphs))
+        return "\n\n".join(parts)
+
+    def _create_batch_prompt(self, batch: List[Tuple[Path, str]]) -> str:
+        """Create a prompt holding several numbered files, asking for one result section per file."""
+        parts = [
+            f"The following {len(batch)} files are each introduced by a \"===FILE n: path===\" header.\n"
+            "Analyze every file separately. Reply with exactly one section per file, in order, "
+            "each starting with a line of the form \"### RESULT n\" where n is the file number.\n"
+        ]
+        for n, (file_path, content) in enumerate(batch, 1):
+            parts.append(f"\n===FILE {n}: {file_path}===\n{content}\n")
+        return "".join(parts)
+
+    def _split_batched_response(self, response: str, n: int) -> Optional[List[str]]:
+        """
+        Split a batched response into per-file sections.
+
+        Returns:
+            A list of n analyses ordered by file number, or None if the
+            response does not contain exactly one section for each file.
+        """
+        markers = list(_RESULT_HEADER_RE.finditer(response))
+        if [int(m.group(1)) for m in markers] != list(range(1, n + 1)):
+            return None
+
+        sections = []
+        for marker, next_marker in zip(markers, markers[1:] + [None]):
+            end = next_marker.start() if next_marker else len(response)
+            sections.append(response[marker.end():end].strip())
+        return sections
+
+    def _iter_units(self, files: List[Path], max_tokens: int = 6000,
+                    max_file_bytes: int = BATCH_FILE_MAX_BYTES) -> Iterator:
+        """
+        Greedily pack small files into batches that fit within a prompt token
+        budget, yielding each unit of work as soon as it is known. Reads files,
+        so it is advanced on _cpu_pool.
+
+        Args:
+            files: Files to pack, in the order they should be analyzed
+            max_tokens: Prompt token budget for a single batch
+            max_file_bytes: Size above which a file is always analyzed on its own
+
+        Yields:
+            Either a list of (path, content) pairs sharing one request, or a
+            single path to analyze on its own (too large, unreadable, or left
+            alone in a batch)
+        """
+        current = []
+        current_tokens = 0
+
+        for file_path in files:
+            try:
+                # Files that cannot fit in a batch are not worth reading twice, and
+                # larger files get better answers without neighbours in the prompt
+                if self._file_stat(file_path)[1] > min(max_tokens * 4, max_file_bytes):
+                    yield file_path
+                    continue
+                if self.filters.skip_binary and self._looks_binary(file_path):
+                    yield file_path
+                    continue
+                content = self._read_file(file_path)
+            except Exception:
+                # Let analyze_file_async report the error for this file
+                yield file_path
+                continue
+
+            # Room for the "===FILE n: path===" header
+            tokens = estimate_tokens(content) + estimate_tokens(str(file_path)) + 8
+            if not content or tokens > max_tokens:
+                yield file_path
+                continue
+
+            if current and current_tokens + tokens > max_tokens:
+                # A batch of one gains nothing over a plain request
+                yield current if len(current) > 1 else current[0][0]
+                current, current_tokens = [], 0
+            current.append((file_path, content))
+            current_tokens += tokens
+
+        if current:
+            yield current if len(current) > 1 else current[0][0]
+
+    async def _get_ai_analysis_async(self, prompt: str) -> str:
+        """
+        Get analysis from the AI model using streaming with retry mechanism.
+
+        Only transient failures (network errors, rate limiting, server errors)
+        are retried, with jittered exponential backoff; anything else fails
+        immediately.
+        """
+        max_retries = 5
         retry_count = 0
         backoff_factor = 2  # Exponential backoff factor
+        max_wait = 60
 
         while retry_count < max_retries:
+            # A rough estimate is enough for throttling and keeps encoding off the event loop
+            await self._limiter.acquire(len(prompt) // 4)
+            started = time.monotonic()
             try:
-                self.logger.debug("Connecting to AI model...")
-                response = ""
-                for event in replicate.stream(
-                    self.api_model,
-                    input={
-                        "prompt": prompt,
-                        "max_tokens": 8192,
-                        "system_prompt": self.system_prompt,
-                        "max_image_resolution": 0.5
-                    }
-                ):
-                    response += str(event)
+                async with self._request_slot():
+                    self.logger.debug("Connecting to AI model...")
+                    response = ""
+                    async for event in await self._replicate.async_stream(
+                        self.api_model,
+                        input={
+                            "prompt": prompt,
+                            "max_tokens": 8192,
+                            "system_prompt": self.system_prompt,
+                            "max_image_resolution": 0.5
+                        }
+                    ):
+                        response += str(event)
 
                 self.logger.debug("Received response from AI model")
+                await self._adjust_concurrency(started, throttled=False)
                 return response.strip()
 
             except Exception as e:
+                if self._is_rate_limited(e):
+                    await self._adjust_concurrency(started, throttled=True)
+                if not self._is_transient_error(e):
+                    self.logger.error("Failed to get AI analysis (not retrying): %s", e)
+                    return f"Error getting AI analysis: {str(e)}"
+
                 retry_count += 1
                 if retry_count < max_retries:
-                    wait_time = backoff_factor ** retry_count
-                    self.logger.warning(f"Error getting AI analysis: {str(e)}. Retrying in {wait_time} seconds (attempt {retry_count}/{max_retries})...")
-                    time.sleep(wait_time)
+                    wait_time = self._retry_after(e)
+                    if wait_time is None:
+                        # Spread retries around the exponential schedule so concurrent
+                        # requests that failed together do not come back in lockstep
+                        wait_time = min(max_wait, backoff_factor ** retry_count * random.uniform(0.5, 1.5))
+                    self.logger.warning("Error getting AI analysis: %s. Retrying in %.1f seconds (attempt %d/%d)...",
+                                        e, wait_time, retry_count, max_retries)
+                    await asyncio.sleep(wait_time)
                 else:
-                    self.logger.error(f"Failed to get AI analysis after {max_retries} attempts: {str(e)}")
+                    self.logger.error("Failed to get AI analysis after %d attempts: %s", max_retries, e)
                     return f"Error getting AI analysis after {max_retries} attempts: {str(e)}"
 
+    def _is_transient_error(self, error: Exception) -> bool:
+        """Check whether a failed request is worth retrying."""
+        if isinstance(error, httpx.TransportError):
+            # Timeouts, refused or dropped connections
+            return True
+        if isinstance(error, httpx.HTTPStatusError):
+            return error.response.status_code in RETRYABLE_STATUSES
+        if isinstance(error, replicate.exceptions.ModelError):
+            # The prediction itself failed; sending it again will not help
+            return False
+        if isinstance(error, replicate.exceptions.ReplicateError):
+            # Errors without a status, such as an unsupported model, are permanent
+            return getattr(error, "status", None) in RETRYABLE_STATUSES
+        return False
+
+    def _is_rate_limited(self, error: Exception) -> bool:
+        """Check whether a failed request was rejected with 429 Too Many Requests."""
+        if isinstance(error, httpx.HTTPStatusError):
+            return error.response.status_code == 429
+        return isinstance(error, replicate.exceptions.ReplicateError) and getattr(error, "status", None) == 429
+
+    def _retry_after(self, error: Exception) -> Optional[float]:
+        """
+        Return the delay requested by a Retry-After response header.
+
+        Only httpx.HTTPStatusError keeps the response; the ReplicateError that
+        replicate raises for API errors, including 429, carries no headers,
+        so those retries always use the regular backoff.
+        """
+        if not isinstance(error, httpx.HTTPStatusError):
+            return None
+        value = error.response.headers.get("retry-after")
+        try:
+            return min(float(value), 300.0) if value is not None else None
+        except ValueError:
+            # HTTP-date form, fall back to the regular backoff
+            return None
+
     def _structure_results(self, response: str, file_path: Path) -> Dict:
         """Structure the analysis results."""
-        return {
+        result = {
             "file": str(file_path),
             "analysis": response,
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": self.run_started_iso,
             "status": "completed"
         }
+        # The file as it was analyzed, so --resume can tell whether it changed since
+        stat = self._read_stats.get(str(file_path)) or self._walk_stats.get(str(file_path))
+        if stat is not None:
+            result["mtime_ns"], result["size"] = stat
+        return result
 
     def analyze_directory(self, directory: Path, file_extensions=None) -> List[Dict]:
+        """Synchronous wrapper around analyze_directory_async."""
+        return asyncio.run(self.analyze_directory_async(directory, file_extensions))
+
+    async def analyze_directory_async(self, directory: Path, file_extensions=None,
+                                      report: Optional[ReportWriter] = None) -> List[Dict]:
         """
-        Analyze all files in a directory recursively.
+        Analyze all files in a directory recursively, running up to
+        `self.concurrency` AI requests at the same time.
 
         Args:
             directory: Path to the directory to analyze
             file_extensions: Optional file extension(s) to filter files (without the dot)
                              Can be a single string or a list of strings
+            report: Optional report writer; each result is written to it as soon
+                    as it completes and only its file and status are kept in
+                    the returned list
         """
-        self.logger.info(f"Starting analysis of directory: {Fore.BLUE}{directory}{Style.RESET_ALL}")
-
         results = []
+        async for result in self.iter_analyses(directory, file_extensions):
+            if report is None:
+                results.append(result)
+            else:
+                report.write_entry(result)
+                results.append({"file": result["file"], "status": result.get("status", "unknown")})
+        return results
+
+    async def iter_analyses(self, directory: Path, file_extensions=None) -> AsyncIterator[Dict]:
+        """
+        Analyze all files in a directory recursively, yielding each result as
+        soon as it is ready (in completion order, not discovery order).
+
+        Args:
+            directory: Path to the directory to analyze
+            file_extensions: Optional file extension(s) to filter files (without the dot)
+                             Can be a single string or a list of strings
+        """
+        self.logger.info("Starting analysis of directory: %s%s%s", _BLUE, directory, _RESET)
+
+        self._start_run()
+        self._walk_stats.clear()
         files = list(self._find_files(directory, file_extensions))
 
         if not files:
-            self.logger.warning(f"No matching files found in {directory}")
-            return results
-
-        self.logger.info(f"Found {Fore.YELLOW}{len(files)}{Style.RESET_ALL} files to analyze")
+            self.logger.warning("No matching files found in %s", directory)
+            return
+
+        self.logger.info("Found %s%d%s files to analyze", _YELLOW, len(files), _RESET)
+
+        loop = asyncio.get_running_loop()
+        progress = ProgressReporter(len(files), self.logger)
+
+        def finish(unit_results: List[Dict]) -> List[Dict]:
+            """Count finished results before they are handed out."""
+            self.stats["by_status"].update(count_statuses(unit_results))
+            progress.advance(len(unit_results))
+            return unit_results
+
+        with progress:
+            # Unchanged files with a cached analysis need neither reading nor hashing
+            if self.cache is not None:
+                unchanged, files = await loop.run_in_executor(self._cpu_pool, self._lookup_unchanged, files)
+                if unchanged:
+                    self.logger.info("Reusing cached analyses for %d unchanged files", len(unchanged))
+                    for result in finish(unchanged):
+                        yield result
+
+            # Byte-identical copies are analyzed once and share the result
+            unique_files, duplicates = await loop.run_in_executor(self._cpu_pool, self._group_duplicates, files)
+            if len(unique_files) < len(files):
+                self.logger.info("Skipping %d duplicate files with identical content", len(files) - len(unique_files))
+
+            # Each unit of work is either a single file or a batch of small files. Batches
+            # are packed as the run goes, so only the files of queued batches are in memory
+            if self.batch_tokens > 0:
+                batched = self._iter_units(unique_files, self.batch_tokens)
+                async def next_unit():
+                    return await loop.run_in_executor(self._cpu_pool, next, batched, None)
+            else:
+                singles = iter(unique_files)
+                async def next_unit():
+                    return next(singles, None)
+
+            async def run_unit(i: int, unit) -> List[Dict]:
+                try:
+                    if isinstance(unit, list):
+                        self.logger.debug("Processing request %d: batch of %d files", i, len(unit))
+                        return await self.analyze_batch_async(unit)
+                    self.logger.debug("Processing request %d: %s%s%s", i, _BLUE, unit, _RESET)
+                    return [await self.analyze_file_async(unit)]
+                except Exception as e:
+                    # One failing unit must not abort the rest of the run
+                    paths = [file_path for file_path, _ in unit] if isinstance(unit, list) else [unit]
+                    self.stats["errors"] += len(paths)
+                    self.logger.error("❌ Error analyzing %s: %s", ", ".join(map(str, paths)), e)
+                    return [{"error": str(e), "file": str(file_path), "status": "failed"} for file_path in paths]
+
+            # Requests are limited by _request_slot; keeping twice as many units running
+            # has the next files read and ready while earlier requests are in flight.
+            # Units are started in discovery order as earlier ones finish.
+            window = self.concurrency * 2
+            running = set()
+            started = 0
+            batches = 0
+            batched_files = 0
+            exhausted = False
+            try:
+                while running or not exhausted:
+                    while not exhausted and len(running) < window:
+                        unit = await next_unit()
+                        if unit is None:
+                            exhausted = True
+                            break
+                        started += 1
+                        if isinstance(unit, list):
+                            batches += 1
+                            batched_files += len(unit)
+                        running.add(asyncio.ensure_future(run_unit(started, unit)))
+                    if not running:
+                        break
+
+                    done, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        unit_results = []
+                        for result in task.result():
+                            unit_results.append(result)
+                            for duplicate in duplicates.get(result["file"], ()):
+                                unit_results.append(dict(result, file=duplicate, duplicate_of=result["file"]))
+                        for result in finish(unit_results):
+                            yield result
+            finally:
+                # The consumer may stop early; do not leave requests running
+                for task in running:
+                    task.cancel()
+
+            if batches:
+                self.logger.info("Packed %d small files into %d batched requests", batched_files, batches)
+
+        self.logger.info("Completed analysis of directory: %s%s%s", _BLUE, directory, _RESET)
+
+    def _group_duplicates(self, files: List[Path]) -> Tuple[List[Path], Dict[str, List[str]]]:
+        """
+        Find files with byte-identical content.
 
-        for i, file_path in enumerate(files, 1):
-            self.logger.info(f"Processing file {i}/{len(files)}: {Fore.BLUE}{file_path}{Style.RESET_ALL}")
-            result = self.analyze_file(file_path)
-            results.append(result)
+        Only files sharing their size with another file are hashed, so trees
+        without duplicates cost one stat per file.
 
-        self.logger.info(f"Completed analysis of directory: {Fore.BLUE}{directory}{Style.RESET_ALL}")
-        return results
+        Returns:
+            A tuple of (unique_files, duplicates): the files to analyze in
+            their original order, and for each of them (as a string path) the
+            other paths with the same content
+        """
+        by_size = defaultdict(list)
+        for file_path in files:
+            try:
+                size = self._file_stat(file_path)[1]
+            except OSError:
+                size = 0
+            by_size[size].append(file_path)
+
+        skip = set()
+        duplicates = {}
+        for size, paths in by_size.items():
+            # Empty and oversized files are skipped cheaply anyway
+            if size == 0 or len(paths) == 1 or (self.filters.max_bytes and size > self.filters.max_bytes):
+                continue
+            by_hash = defaultdict(list)
+            for file_path in paths:
+                try:
+                    by_hash[self._hash_file(file_path)].append(file_path)
+                except OSError:
+                    continue
+            for same in by_hash.values():
+                if len(same) > 1:
+                    duplicates[str(same[0])] = [str(p) for p in same[1:]]
+                    skip.update(same[1:])
+
+        return [p for p in files if p not in skip], duplicates
+
+    def _hash_file(self, file_path: Path) -> bytes:
+        """Hash a non-empty file's bytes through a read-only memory map, without copying them."""
+        with open(file_path, 'rb') as file:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return hashlib.blake2b(mm, digest_size=16).digest()
 
     def _find_files(self, directory: Path, file_extensions=None):
         """
-        Find all matching files in a directory recursively.
+        Find all files in a directory recursively that pass self.filters.
 
         Args:
             directory: Path to the directory to search
             file_extensions: Optional file extension(s) to filter files (without the dot)
-                             Can be a single string or a list of strings
+                             Can be a single string or a list of strings; overrides
+                             self.filters.exts when given
         """
-        for file_path in directory.rglob("*"):
-            if file_path.is_file():
-                if file_extensions is None:
-                    # No extension filter, yield all files
-                    yield file_path
-                elif isinstance(file_extensions, list):
-                    # Multiple extensions provided
-                    if any(file_path.suffix.lower() == f".{ext}" for ext in file_extensions):
-                        yield file_path
-                else:
-                    # Single extension provided
-                    if file_path.suffix.lower() == f".{file_extensions}":
+        filters = self.filters
+        # The per-file check is a single set lookup either way
+        exts = filters.exts if file_extensions is None else normalize_extensions(file_extensions)
+
+        # Walk with os.scandir so file type checks come from the cached
+        # directory entries instead of an extra stat per path
+        root = str(directory)
+        # Compared with the relative path computed for each entry anyway
+        real_root = os.path.realpath(root)
+        skip = {os.path.relpath(p, real_root).replace(os.sep, "/") for p in filters.skip_paths
+                if os.path.commonpath([p, real_root]) == real_root}
+        stack = [root]
+        while stack:
+            try:
+                with os.scandir(stack.pop()) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            rel_path = os.path.relpath(entry.path, root).replace(os.sep, "/")
+                            if ((filters.skip_vendor and entry.name in SKIP_DIRS) or rel_path in skip
+                                    or self._is_excluded(rel_path)):
+                                self.logger.debug("Skipping directory: %s", entry.path)
+                            else:
+                                stack.append(entry.path)
+                            continue
+                        if not entry.is_file():
+                            continue
+
+                        name = entry.name.lower()
+                        if exts is not None and os.path.splitext(name)[1] not in exts:
+                            continue
+
+                        rel_path = os.path.relpath(entry.path, root).replace(os.sep, "/")
+                        if ((filters.skip_vendor and name.endswith(SKIP_SUFFIXES)) or rel_path in skip
+                                or self._is_excluded(rel_path)):
+                            self.logger.debug("Skipping file: %s", entry.path)
+                            continue
+                        if filters.include and not any(fnmatch.fnmatch(rel_path, p) for p in filters.include):
+                            continue
+                        try:
+                            st = entry.stat()
+                        except OSError as e:
+                            self.logger.warning("Cannot stat file: %s", e)
+                            continue
+                        # Files over max_bytes are kept, so analyze_file_async lists them as skipped
+                        # Saves the cache fast path and the size checks another stat each. Keyed
+                        # like every lookup, by str(Path), which drops the "./" of entry.path
+                        file_path = Path(entry.path)
+                        self._walk_stats[str(file_path)] = (st.st_mtime_ns, st.st_size)
+
                         yield file_path
+            except OSError as e:
+                self.logger.warning("Cannot read directory: %s", e)
 
-    def save_report(self, results: List[Dict], output_path: Path):
-        """Save the analysis results to a text file with nice formatting."""
-        self.logger.info(f"Saving report to: {Fore.BLUE}{output_path}{Style.RESET_ALL}")
+    def _is_excluded(self, rel_path: str) -> bool:
+        """Check a path relative to the analyzed directory against the --exclude globs."""
+        return any(fnmatch.fnmatch(rel_path, pattern) for pattern in self.filters.exclude)
 
-        try:
-            with open(output_path, 'w', encoding='utf-8') as f:
-                f.write("=== REPORT ===\n")
-                f.write(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
-
-                successful_analyses = 0
-                failed_analyses = 0
-                skipped_files = 0
-                for i, result in enumerate(results, 1):
-                    # Write file header
-                    f.write(f"FILE #{i}: {result['file']}\n")
-                    f.write("=" * 80 + "\n")
-
-                    # Write status and count by status
-                    status = result.get('status', 'unknown')
-                    f.write(f"Status: {status.upper()}\n")
-
-                    if status == 'completed':
-                        successful_analyses += 1
-                    elif status == 'failed':
-                        failed_analyses += 1
-                    elif status == 'skipped':
-                        skipped_files += 1
-
-                    # Write timestamp if available
-                    if 'timestamp' in result:
-                        f.write(f"Analyzed: {result['timestamp']}\n\n")
-                    else:
-                        f.write("\n")
-
-                    # Write analysis or error
-                    if 'error' in result:
-                        f.write(f"ERROR: {result['error']}\n")
-                    elif 'reason' in result:
-                        f.write(f"NOTE: {result['reason']}\n")
-                    else:
-                        f.write("ANALYSIS:\n")
-                        f.write("-" * 80 + "\n")
-                        f.write(f"{result['analysis']}\n")
+    def save_report(self, results: Iterable[Dict], output_path: Path):
+        """
+        Save the analysis results to a text file with nice formatting.
 
-                    # Add separator between files
-                    f.write("\n\n" + "=" * 80 + "\n\n")
+        Results may come from any iterable, including a generator; each one is
+        written as it is produced and not kept afterwards.
+        """
+        self.logger.info("Saving report to: %s%s%s", _BLUE, output_path, _RESET)
 
-                # Write summary
-                f.write("=== SUMMARY ===\n")
-                f.write(f"Total files processed: {len(results)}\n")
-                f.write(f"Successfully analyzed: {successful_analyses}\n")
-                f.write(f"Failed analyses: {failed_analyses}\n")
-                f.write(f"Skipped files: {skipped_files}\n")
+        try:
+            with ReportWriter(output_path) as report:
+                for result in results:
+                    report.write_entry(result)
+                report.write_summary()
 
-            self.logger.info(f"✅ Report successfully saved to: {Fore.BLUE}{output_path}{Style.RESET_ALL}")
+            self.logger.info("✅ Report successfully saved to: %s%s%s", _BLUE, output_path, _RESET)
         except Exception as e:
-            self.logger.error(f"❌ Failed to save report: {str(e)}")
+            self.logger.error("❌ Failed to save report: %s", e)
 
-    def generate_summary(self, results: List[Dict]) -> str:
-        """Generate a summary of the analysis results."""
-        # Count results by status
-        successful = sum(1 for r in results if r.get('status') == 'completed')
-        failed = sum(1 for r in results if r.get('status') == 'failed')
-        skipped = sum(1 for r in results if r.get('status') == 'skipped')
+    def generate_summary(self, results: Optional[List[Dict]] = None) -> str:
+        """
+        Generate a summary of the analysis results.
 
-        summary = f"""
-{Fore.CYAN}
-{Fore.CYAN}║ {Fore.YELLOW} ANALYSIS SUMMARY
-{Fore.CYAN}
-{Fore.CYAN}║ {Fore.WHITE}Total files processed:    {Fore.GREEN}{len(results):<5}
-{Fore.CYAN}║ {Fore.WHITE}Successfully analyzed:    {Fore.GREEN}{successful:<5}
-{Fore.CYAN}║ {Fore.WHITE}Failed analyses:          {Fore.RED if failed > 0 else Fore.GREEN}{failed:<5}
-{Fore.CYAN}║ {Fore.WHITE}Skipped files:            {Fore.YELLOW}{skipped:<5}
-{Fore.CYAN}
-"""
+        Args:
+            results: Optional results to summarize; defaults to the status
+                     counts gathered while analyzing
+        """
+        if results is None:
+            counts = self.stats["by_status"]
+        else:
+            counts = count_statuses(results)
+
+        failed = counts['failed']
+        summary = SUMMARY_TEMPLATE.format(
+            total=sum(counts.values()),
+            successful=counts['completed'],
+            failed=failed,
+            failed_color=Fore.RED if failed > 0 else Fore.GREEN,
+            skipped=counts['skipped']
+        )
         return summary
 
 
@@ -329,8 +1728,12 @@ def main():
     parser.add_argument('directory', type=str, help='Path to the directory to analyze')
     parser.add_argument('--output', type=str, default='analysis_report.txt',
                       help='Path to save the analysis report (default: analysis_report.txt)')
-    parser.add_argument('--summary', action='store_true',
-                      help='Generate and display a summary')
+    parser.add_argument('--json-out', '--jsonl-output', type=str,
+                      help='Also write every result as a JSON line to this file, for other tools')
+    parser.add_argument('--resume', action='store_true',
+                      help='Reuse the completed analyses in an existing --json-out file from an interrupted run')
+    # Kept so existing command lines still parse; the summary is always shown
+    parser.add_argument('--summary', action='store_true', help=argparse.SUPPRESS)
     parser.add_argument('--verbose', '-v', action='store_true',
                       help='Enable verbose logging')
     parser.add_argument('--model', type=str, default='anthropic/claude-3.5-sonnet',
@@ -341,8 +1744,53 @@ def main():
                       help='File extension to analyze (without the dot, e.g. "js" for JavaScript files)')
     parser.add_argument('--extensions', nargs='+',
                       help='Multiple file extensions to analyze (e.g. --extensions js py txt)')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                      help=f'Maximum number of AI requests in flight at once (default: {DEFAULT_CONCURRENCY})')
+    parser.add_argument('--requests-per-minute', type=int, default=0,
+                      help='Throttle AI requests to this many per minute (default: 0, no limit)')
+    parser.add_argument('--tokens-per-minute', type=int, default=0,
+                      help='Throttle AI requests to about this many prompt tokens per minute (default: 0, no limit)')
+    parser.add_argument('--batch-tokens', type=int, default=0,
+                      help='Pack small files into shared requests of up to this many prompt tokens, '
+                           'e.g. 6000 (default: 0, one request per file)')
+    parser.add_argument('--include', nargs='+', metavar='GLOB',
+                      help='Only analyze files whose path relative to the directory matches one of these globs')
+    parser.add_argument('--exclude', nargs='+', metavar='GLOB',
+                      help='Skip files and directories whose relative path matches one of these globs')
+    parser.add_argument('--max-file-size', type=int, default=DEFAULT_MAX_FILE_SIZE,
+                      help=f'Skip files larger than this many bytes, 0 for no limit (default: {DEFAULT_MAX_FILE_SIZE})')
+    parser.add_argument('--include-binary', action='store_true',
+                      help='Analyze files that look binary (contain a NUL byte near the start) instead of skipping them')
+    parser.add_argument('--no-vendor-skip', action='store_true',
+                      help='Descend into dependency and build directories and analyze minified bundles too')
+    parser.add_argument('--chunk-tokens', type=int, default=0,
+                      help='Split files larger than this many prompt tokens into overlapping chunks analyzed in '
+                           f'parallel, e.g. 4000; at least {MIN_CHUNK_TOKENS} (default: 0, send files whole)')
+    parser.add_argument('--preserve-comments', action='store_true',
+                      help='Send JavaScript/TypeScript files as-is instead of stripping comments and extra whitespace')
+    parser.add_argument('--no-cache', action='store_true',
+                      help='Do not reuse or store analyses in the .deepwalker_cache directory')
+    parser.add_argument('--cache-ttl', type=float, default=7,
+                      help='Days without being used before a cached analysis expires (default: 7)')
+    parser.add_argument('--cache-max-entries', type=int, default=DEFAULT_CACHE_MAX_ENTRIES,
+                      help=f'Keep at most this many cached analyses, most recently used first, 0 for no limit '
+                           f'(default: {DEFAULT_CACHE_MAX_ENTRIES})')
 
     args = parser.parse_args()
+    if args.resume and not args.json_out:
+        parser.error("--resume needs --json-out to know where the interrupted run wrote its results")
+    if args.chunk_tokens < 0 or 0 < args.chunk_tokens < MIN_CHUNK_TOKENS:
+        parser.error(f"--chunk-tokens must be 0 (off) or at least {MIN_CHUNK_TOKENS}")
+    if args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+    if args.requests_per_minute < 0 or args.tokens_per_minute < 0:
+        parser.error("--requests-per-minute and --tokens-per-minute cannot be negative")
+    if args.max_file_size < 0:
+        parser.error("--max-file-size cannot be negative (use 0 for no limit)")
+    if args.cache_ttl <= 0:
+        parser.error("--cache-ttl must be positive (use --no-cache to disable caching)")
+    if args.cache_max_entries < 0:
+        parser.error("--cache-max-entries cannot be negative (use 0 for no limit)")
 
     # Display banner
     display_banner()
@@ -353,15 +1801,13 @@ def main():
 
     # Load system prompt
     system_prompt = load_system_prompt(args.system_prompt)
-    logger.debug(f"Using system prompt: {system_prompt[:50]}..." if len(system_prompt) > 50 else system_prompt)
-
-    # Create analyzer
-    analyzer = CodeAnalyzer(api_model=args.model, logger=logger, system_prompt=system_prompt)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Using system prompt: %s%s", system_prompt[:50], "..." if len(system_prompt) > 50 else "")
 
     # Validate directory
     directory = Path(args.directory)
     if not directory.exists() or not directory.is_dir():
-        logger.error(f"❌ Invalid directory: {directory}")
+        logger.error("❌ Invalid directory: %s", directory)
         sys.exit(1)
 
     # Determine file extensions to analyze
@@ -369,28 +1815,60 @@ def main():
     if args.extensions:
         # If multiple extensions are provided via --extensions
         file_extensions = [ext.lstrip('.') for ext in args.extensions]
-        logger.info(f"Analyzing files with extensions: {', '.join(file_extensions)}")
+        logger.info("Analyzing files with extensions: %s", ", ".join(file_extensions))
     elif args.file_extension:
         # If a single extension is provided via --file-extension
         file_extensions = args.file_extension.lstrip('.')
-        logger.info(f"Analyzing files with extension: {file_extensions}")
+        logger.info("Analyzing files with extension: %s", file_extensions)
+
+    output_path = Path(args.output)
+    json_path = Path(args.json_out) if args.json_out else None
+
+    # Open the analysis cache
+    cache = None if args.no_cache else AnalysisCache(ttl=args.cache_ttl * 86400, max_entries=args.cache_max_entries)
+
+    # All file selection options, normalized once
+    filters = FilterConfig(
+        exts=normalize_extensions(file_extensions),
+        include=tuple(args.include or ()),
+        exclude=tuple(args.exclude or ()),
+        max_bytes=args.max_file_size,
+        skip_binary=not args.include_binary,
+        skip_vendor=not args.no_vendor_skip,
+        # The report files and the cache database are written while the tree is walked
+        skip_paths=frozenset(os.path.realpath(p) for p in (output_path, json_path, cache and cache.path.parent)
+                             if p is not None),
+    )
 
-    # Analyze directory
-    logger.info(f"Starting analysis of: {Fore.BLUE}{directory}{Style.RESET_ALL}")
-    results = analyzer.analyze_directory(directory, file_extensions)
+    # Create analyzer
+    analyzer = CodeAnalyzer(api_model=args.model, logger=logger, system_prompt=system_prompt,
+                            concurrency=args.concurrency, batch_tokens=args.batch_tokens, cache=cache,
+                            filters=filters, chunk_tokens=args.chunk_tokens, strip_comments=not args.preserve_comments,
+                            requests_per_minute=args.requests_per_minute, tokens_per_minute=args.tokens_per_minute)
+
+    # Analyze directory, writing each report entry as soon as it is ready
+    carried_records = []
+    if args.resume and json_path.exists():
+        # Load before the report writer truncates the file, which then gets them back first thing
+        carried_records = analyzer.load_resume(json_path)
+        logger.info("Resuming with %d analyses from: %s%s%s", len(carried_records), _BLUE, json_path, _RESET)
+    logger.info("Starting analysis of: %s%s%s", _BLUE, directory, _RESET)
+    logger.info("Writing report to: %s%s%s", _BLUE, output_path, _RESET)
+    try:
+        with ReportWriter(output_path, json_path, carried_records) as report:
+            results = asyncio.run(analyzer.analyze_directory_async(directory, report=report))
+            report.write_summary()
+    finally:
+        analyzer.close()
 
     # Check if any analysis was performed
     if not results:
         print(f"\n{Fore.YELLOW}No files were analyzed. Please check your file extensions or directory path.{Style.RESET_ALL}")
     else:
-        # Save report
-        output_path = Path(args.output)
-        analyzer.save_report(results, output_path)
-
-        # Display summary if requested
-        if args.summary or True:  # Always show summary
-            summary = analyzer.generate_summary(results)
-            print(summary)
+        logger.info("✅ Report successfully saved to: %s%s%s", _BLUE, output_path, _RESET)
+
+        # Display summary
+        print(analyzer.generate_summary())
 
 if __name__ == "__main__":
     try:
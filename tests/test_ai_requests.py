@@ -0,0 +1,98 @@
+import asyncio
+import logging
+
+import pytest
+
+# deepwalker imports its API client at module level
+pytest.importorskip("replicate")
+httpx = pytest.importorskip("httpx")
+pytest.importorskip("colorama")
+
+import deepwalker
+from deepwalker import CodeAnalyzer
+from replicate.exceptions import ReplicateError
+
+
+@pytest.fixture
+def analyzer():
+    analyzer = CodeAnalyzer(api_model="test/model", logger=logging.getLogger("test"), system_prompt="")
+    yield analyzer
+    analyzer.close()
+
+
+class FakeClient:
+    """Fails with the given errors in turn, then streams "ok"."""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    async def async_stream(self, model, input):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+
+        async def events():
+            yield "ok"
+        return events()
+
+
+def analyze(analyzer, client) -> str:
+    async def run():
+        analyzer._start_run()
+        analyzer._replicate = client
+        return await analyzer._get_ai_analysis_async("prompt")
+    return asyncio.run(run())
+
+
+def http_error(status: int, headers=None):
+    request = httpx.Request("POST", "https://api.replicate.com/v1/predictions")
+    response = httpx.Response(status, headers=headers, request=request)
+    return httpx.HTTPStatusError("error", request=request, response=response)
+
+
+def test_error_classification(analyzer):
+    assert analyzer._is_transient_error(httpx.ConnectError("refused"))
+    assert analyzer._is_transient_error(http_error(503))
+    assert not analyzer._is_transient_error(http_error(400))
+    assert analyzer._is_transient_error(ReplicateError(status=429))
+    assert not analyzer._is_transient_error(ReplicateError(status=422))
+    assert not analyzer._is_transient_error(ReplicateError(detail="Model does not support streaming"))
+    assert not analyzer._is_transient_error(ValueError("bug"))
+
+
+def test_rate_limit_detection(analyzer):
+    assert analyzer._is_rate_limited(http_error(429))
+    assert analyzer._is_rate_limited(ReplicateError(status=429))
+    assert not analyzer._is_rate_limited(ReplicateError(status=500))
+
+
+def test_retry_after_header(analyzer):
+    assert analyzer._retry_after(http_error(429, {"Retry-After": "7"})) == 7.0
+    assert analyzer._retry_after(http_error(429, {"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"})) is None
+    assert analyzer._retry_after(ReplicateError(status=429)) is None
+
+
+def test_permanent_error_is_not_retried(analyzer):
+    client = FakeClient(ReplicateError(detail="Model does not support streaming"))
+    assert analyze(analyzer, client).startswith("Error getting AI analysis")
+    assert client.calls == 1
+
+
+def test_transient_error_is_retried(analyzer, monkeypatch):
+    # No backoff delay
+    monkeypatch.setattr(deepwalker.random, "uniform", lambda a, b: 0.0)
+    client = FakeClient(ReplicateError(status=503), httpx.ConnectError("reset"))
+    assert analyze(analyzer, client) == "ok"
+    assert client.calls == 3
+
+
+def test_split_batched_response(analyzer):
+    response = "### RESULT 1\nfirst\n\n### RESULT 2\nsecond\n"
+    assert analyzer._split_batched_response(response, 2) == ["first", "second"]
+
+
+def test_split_batched_response_needs_every_section_in_order(analyzer):
+    assert analyzer._split_batched_response("### RESULT 1\nonly one\n", 2) is None
+    assert analyzer._split_batched_response("### RESULT 2\nb\n### RESULT 1\na\n", 2) is None
+    assert analyzer._split_batched_response("no sections at all", 1) is None
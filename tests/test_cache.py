@@ -0,0 +1,108 @@
+import sqlite3
+import zlib
+
+import pytest
+
+# deepwalker imports its API client at module level
+pytest.importorskip("replicate")
+pytest.importorskip("httpx")
+pytest.importorskip("colorama")
+
+import deepwalker
+from deepwalker import AnalysisCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = AnalysisCache(tmp_path / "analyses.sqlite3", ttl=3600, max_entries=2)
+    yield cache
+    cache.close()
+
+
+def set_last_used(cache, key, last_used):
+    cache._conn.execute("UPDATE analyses SET last_used = ? WHERE key = ?", (last_used, key))
+    cache._conn.commit()
+
+
+def test_round_trip(cache):
+    cache.set("k", "analysis text")
+    assert cache.get("k") == "analysis text"
+    assert cache.get("missing") is None
+
+
+def test_zlib_when_zstandard_is_missing(cache, monkeypatch):
+    monkeypatch.setattr(deepwalker, "zstandard", None)
+    cache.set("k", "analysis text")
+    stored = cache._conn.execute("SELECT analysis FROM analyses").fetchone()[0]
+    assert zlib.decompress(stored) == b"analysis text"
+    assert cache.get("k") == "analysis text"
+
+
+def test_zstd_entries_are_decoded(cache):
+    zstandard = pytest.importorskip("zstandard")
+    value = zstandard.ZstdCompressor().compress(b"analysis text")
+    assert AnalysisCache._decompress(value) == "analysis text"
+
+
+def test_legacy_text_and_corrupt_entries(cache):
+    assert AnalysisCache._decompress("stored before compression") == "stored before compression"
+    assert AnalysisCache._decompress(b"not compressed") is None
+
+
+def test_expired_entries_are_ignored_and_pruned(cache):
+    cache.set("old", "a")
+    set_last_used(cache, "old", deepwalker.datetime.now().timestamp() - 7200)
+    assert cache.get("old") is None
+    cache.prune()
+    assert cache._conn.execute("SELECT COUNT(*) FROM analyses").fetchone()[0] == 0
+
+
+def test_prune_keeps_the_most_recently_used(cache):
+    now = deepwalker.datetime.now().timestamp()
+    for age, key in enumerate(["a", "b", "c"]):
+        cache.set(key, key)
+        set_last_used(cache, key, now - 100 * (age + 1))
+    # "c" is the oldest, but using it makes it the most recent
+    assert cache.get("c") == "c"
+    cache.prune()
+    keys = {row[0] for row in cache._conn.execute("SELECT key FROM analyses")}
+    assert keys == {"a", "c"}
+
+
+def test_fingerprint_needs_unchanged_stat_and_live_analysis(cache):
+    cache.set("key", "analysis")
+    cache.set_fingerprint("a.js", "config", 10, 20, "key")
+    assert cache.get_fingerprint("a.js", "config", 10, 20) == "key"
+    assert cache.get_fingerprint("a.js", "config", 11, 20) is None
+    assert cache.get_fingerprint("a.js", "other config", 10, 20) is None
+
+    set_last_used(cache, "key", 0)
+    cache.prune()
+    assert cache.get_fingerprint("a.js", "config", 10, 20) is None
+
+
+def test_migrates_cache_without_last_used(tmp_path):
+    path = tmp_path / "analyses.sqlite3"
+    conn = sqlite3.connect(str(path))
+    conn.execute("CREATE TABLE analyses (key TEXT PRIMARY KEY, analysis TEXT NOT NULL, created REAL NOT NULL)")
+    conn.execute("CREATE INDEX analyses_created ON analyses (created)")
+    created = deepwalker.datetime.now().timestamp() - 60
+    conn.execute("INSERT INTO analyses VALUES ('k', 'plain text', ?)", (created,))
+    conn.commit()
+    conn.close()
+
+    cache = AnalysisCache(path)
+    try:
+        assert cache._conn.execute("SELECT last_used FROM analyses").fetchone()[0] == created
+        indexes = {row[1] for row in cache._conn.execute("PRAGMA index_list(analyses)")}
+        assert "analyses_created" not in indexes
+        assert cache.get("k") == "plain text"
+    finally:
+        cache.close()
+
+
+def test_rejects_invalid_limits(tmp_path):
+    with pytest.raises(ValueError):
+        AnalysisCache(tmp_path / "a.sqlite3", ttl=0)
+    with pytest.raises(ValueError):
+        AnalysisCache(tmp_path / "a.sqlite3", max_entries=-1)
@@ -0,0 +1,31 @@
+import logging
+
+import pytest
+
+# deepwalker imports its API client at module level
+pytest.importorskip("replicate")
+pytest.importorskip("httpx")
+pytest.importorskip("colorama")
+
+from deepwalker import CodeAnalyzer, estimate_tokens
+
+
+@pytest.fixture
+def analyzer():
+    analyzer = CodeAnalyzer(api_model="test/model", logger=logging.getLogger("test"), system_prompt="")
+    yield analyzer
+    analyzer.close()
+
+
+def test_small_budget_overlap_still_advances(analyzer):
+    content = "".join(f"line {i} = foo(bar, baz);\n" for i in range(80))
+    chunks = analyzer._chunk_content(content, max_tokens=150)
+    # The overlap is capped, so the chunks add up to not much more than the file
+    assert sum(map(len, chunks)) < 2 * len(content)
+    assert all(estimate_tokens(chunk) <= 150 for chunk in chunks)
+
+
+def test_minified_line_is_split_within_budget(analyzer):
+    chunks = analyzer._chunk_content("a" * 50000, max_tokens=500)
+    assert "".join(chunks) == "a" * 50000
+    assert all(estimate_tokens(chunk) <= 500 for chunk in chunks)
@@ -0,0 +1,46 @@
+import pytest
+
+# deepwalker imports its API client at module level
+pytest.importorskip("replicate")
+pytest.importorskip("httpx")
+pytest.importorskip("colorama")
+
+from deepwalker import _normalize_js
+
+
+def test_strips_comments_and_collapses_whitespace():
+    source = "var a  =\t1; // note\n\n\n  /* block */ var b = 2;   \n"
+    assert _normalize_js(source) == "var a = 1;\nvar b = 2;"
+
+
+def test_string_literals_are_verbatim():
+    assert _normalize_js('var s = "a    b";') == 'var s = "a    b";'
+    assert _normalize_js("var s = 'x // not a comment';") == "var s = 'x // not a comment';"
+
+
+def test_template_literal_keeps_blank_lines_and_indentation():
+    source = "const t = `line one\n\n    indented  text\n`;"
+    assert _normalize_js(source) == source
+
+
+def test_regex_literal_is_verbatim():
+    assert _normalize_js("var r = /a  b/g;") == "var r = /a  b/g;"
+    assert _normalize_js("return /[/]  x/.test(s);") == "return /[/]  x/.test(s);"
+
+
+def test_division_is_not_a_regex():
+    assert _normalize_js("var x = a / b  / c; // half") == "var x = a / b / c;"
+
+
+def test_url_after_colon_is_not_a_comment():
+    source = "<a href=http://example.com>link</a>"
+    assert _normalize_js(source) == source
+
+
+def test_comment_after_colon_is_stripped():
+    assert _normalize_js("case 'a': // falls through\nbreak;") == "case 'a':\nbreak;"
+    assert _normalize_js("var o = {key: // note\n1};") == "var o = {key:\n1};"
+
+
+def test_division_after_postfix_increment():
+    assert _normalize_js("x = i++ / 2; // c") == "x = i++ / 2;"
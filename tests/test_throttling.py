@@ -0,0 +1,101 @@
+import asyncio
+import logging
+import time
+
+import pytest
+
+# deepwalker imports its API client at module level
+pytest.importorskip("replicate")
+pytest.importorskip("httpx")
+pytest.importorskip("colorama")
+
+from deepwalker import CodeAnalyzer, RateLimiter
+
+
+@pytest.fixture
+def analyzer():
+    analyzer = CodeAnalyzer(api_model="test/model", logger=logging.getLogger("test"), system_prompt="",
+                            concurrency=8)
+    yield analyzer
+    analyzer.close()
+
+
+def elapsed(coro) -> float:
+    async def run():
+        started = time.monotonic()
+        await coro()
+        return time.monotonic() - started
+    return asyncio.run(run())
+
+
+def test_no_limits_never_wait():
+    limiter = RateLimiter()
+    assert elapsed(lambda: limiter.acquire(10 ** 9)) < 0.05
+
+
+def test_waits_for_a_request_to_refill():
+    async def drain_then_acquire():
+        limiter = RateLimiter(requests_per_minute=600)
+        limiter._requests = 0
+        await limiter.acquire()
+    # 600 per minute refills one request every 0.1 s
+    assert elapsed(drain_then_acquire) >= 0.08
+
+
+def test_waits_for_tokens_to_refill():
+    async def drain_then_acquire():
+        limiter = RateLimiter(tokens_per_minute=6000)
+        limiter._tokens = 0
+        await limiter.acquire(10)
+    assert elapsed(drain_then_acquire) >= 0.08
+
+
+def test_prompt_larger_than_the_budget_still_goes_out():
+    limiter = RateLimiter(tokens_per_minute=600)
+    assert elapsed(lambda: limiter.acquire(10 ** 6)) < 0.05
+
+
+def test_rejects_negative_limits():
+    with pytest.raises(ValueError):
+        RateLimiter(requests_per_minute=-1)
+
+
+def test_throttling_halves_once_per_burst_and_recovers(analyzer):
+    async def run():
+        analyzer._start_run()
+        sent = time.monotonic()
+        await analyzer._adjust_concurrency(sent, throttled=True)
+        assert analyzer._effective_concurrency == 4
+        # Sent before the decrease, so it does not count again
+        await analyzer._adjust_concurrency(sent, throttled=True)
+        assert analyzer._effective_concurrency == 4
+
+        await analyzer._adjust_concurrency(time.monotonic(), throttled=False)
+        assert analyzer._effective_concurrency == 4
+        analyzer._last_throttled -= 61
+        await analyzer._adjust_concurrency(time.monotonic(), throttled=False)
+        assert analyzer._effective_concurrency == 5
+    asyncio.run(run())
+
+
+def test_request_slots_cap_requests_in_flight(analyzer):
+    async def run():
+        analyzer._start_run()
+        analyzer._effective_concurrency = 2
+        release = asyncio.Event()
+        peak = 0
+
+        async def request():
+            nonlocal peak
+            async with analyzer._request_slot():
+                peak = max(peak, analyzer._in_flight)
+                await release.wait()
+
+        tasks = [asyncio.ensure_future(request()) for _ in range(5)]
+        await asyncio.sleep(0.01)
+        assert analyzer._in_flight == 2
+        release.set()
+        await asyncio.gather(*tasks)
+        assert peak == 2
+        assert analyzer._in_flight == 0
+    asyncio.run(run())